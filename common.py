@@ -0,0 +1,317 @@
+"""Funciones compartidas de carga, cálculo y gráficos del análisis de residuos.
+
+Centralizar aquí la capa de datos y de gráficos permite reutilizarla desde
+varias páginas de Streamlit compartiendo un único memo de @st.cache_data
+(y por lo tanto una sola copia del DataFrame en memoria).
+"""
+import os
+
+import streamlit as st
+import pandas as pd
+import numpy as np
+
+FILE_NAME = "datos_de_entrada.csv"
+pd.options.display.float_format = '{:,.2f}'.format
+
+# --- Funciones de Carga y Preprocesamiento ---
+
+# Plegado ASCII de los acentos presentes en estos datos (latin1). str.translate
+# es una operación C sobre la tabla; unidecode cubría alfabetos que este
+# dataset nunca contiene, a costa de una llamada Python por valor
+_FOLD = str.maketrans('áéíóúñÁÉÍÓÚÑüÜ', 'aeiounAEIOUNuU')
+
+def _normalize_text_column(s, strip=False):
+    """Normaliza texto (pliega acentos + mayúsculas) solo sobre los valores únicos."""
+    cats = s.astype('category')
+    nuevos = [str(c).translate(_FOLD).upper() for c in cats.cat.categories]
+    if strip:
+        nuevos = [c.strip() for c in nuevos]
+    if len(set(nuevos)) == len(nuevos):
+        return cats.cat.rename_categories(nuevos)
+    # La normalización puede colapsar categorías distintas (acentos/mayúsculas)
+    return cats.map(dict(zip(cats.cat.categories, nuevos))).astype('category')
+
+@st.cache_data(show_spinner=False)
+def load_data(file_path):
+    """Carga, estandariza y limpia los datos del CSV."""
+    try:
+        # Sidecar Parquet: si ya existe y está al día, leerlo es mucho más
+        # rápido que volver a tokenizar el CSV en cada arranque en frío
+        parquet_path = os.path.splitext(file_path)[0] + '.parquet'
+        if os.path.exists(parquet_path) and os.path.getmtime(parquet_path) >= os.path.getmtime(file_path):
+            return pd.read_parquet(parquet_path)
+
+        # Columnas que la app realmente usa: parsear el resto es trabajo perdido
+        usecols = ['PERIODO', 'DEPARTAMENTO', 'DISTRITO', 'GPC_DOM',
+                   'QRESIDUOS_DOM', 'QRESIDUOS_NO_DOM', 'QRESIDUOS_MUN']
+        try:
+            # Motor pyarrow: parseo multihilo y decimal=',' nativo
+            df = pd.read_csv(file_path, sep=';', encoding='latin1', engine='pyarrow',
+                             usecols=usecols, decimal=',')
+        except (ImportError, ValueError):
+            # Sin pyarrow: el motor C también parsea la coma decimal directamente,
+            # sin pasada posterior de reemplazo de strings. memory_map evita
+            # copias intermedias del buffer de lectura
+            df = pd.read_csv(file_path, sep=';', encoding='latin1', engine='c',
+                             usecols=usecols, decimal=',', thousands=' ',
+                             memory_map=True)
+        
+        # 1. Renombrar columnas clave para consistencia
+        df = df.rename(columns={
+            'PERIODO': 'AÑO',
+            'QRESIDUOS_MUN': 'RESIDUOS_MUNICIPALES'
+        }, errors='ignore')
+
+        # 2. Estandarización de texto y tipo de datos (solo sobre valores únicos)
+        df['DEPARTAMENTO'] = _normalize_text_column(df['DEPARTAMENTO'])
+        df['DISTRITO'] = _normalize_text_column(df['DISTRITO'], strip=True)
+        # int16 basta para años y reduce el ancho de banda de los filtros
+        df['AÑO'] = df['AÑO'].astype('int16')
+
+        # 3. Limpieza y conversión de columnas numéricas
+        cols_to_convert = ['GPC_DOM', 'QRESIDUOS_DOM', 'QRESIDUOS_NO_DOM', 'RESIDUOS_MUNICIPALES']
+        for col in cols_to_convert:
+            if col in df.columns:
+                if not pd.api.types.is_numeric_dtype(df[col]):
+                    # Fallback: solo si el parseo directo dejó la columna como
+                    # texto (object, o str/string en pandas 3). Con strings
+                    # Arrow el replace corre como kernel C
+                    try:
+                        s = df[col].astype('string[pyarrow]')
+                    except (ImportError, TypeError):
+                        s = df[col].astype(str)
+                    df[col] = s.str.replace(',', '.', regex=False).str.replace(' ', '', regex=False)
+                # Coercer errores a NaN y rellenar con 0. nan_to_num devuelve un
+                # array nuevo: bajo copy-on-write (pandas 3) to_numpy() puede ser
+                # una vista de solo lectura, así que no se puede mutar in-place.
+                # float32 explícito: suficiente para estos tonelajes y mitad de
+                # memoria (downcast='float' rehusaba el cast con pérdida)
+                arr = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype='float32', na_value=np.nan)
+                df[col] = np.nan_to_num(arr)
+
+        try:
+            df.to_parquet(parquet_path, compression='zstd')
+        except Exception:
+            # Sin motor Parquet disponible: se seguirá leyendo el CSV
+            pass
+
+        return df
+    except Exception as e:
+        st.error(f"Error al cargar/procesar '{file_path}': {e}")
+        return pd.DataFrame()
+
+@st.cache_data(show_spinner=False)
+def get_available_departamentos(df):
+    """Retorna la lista ordenada de departamentos (se calcula una sola vez)."""
+    # Las categorías ya están ordenadas: no hace falta unique() ni sorted()
+    return df['DEPARTAMENTO'].cat.categories.tolist()
+
+@st.cache_data(show_spinner=False)
+def index_by_departamento(df):
+    """Indexa la tabla completa por DEPARTAMENTO (ordenada) una sola vez."""
+    return df.set_index('DEPARTAMENTO').sort_index()
+
+@st.cache_data(show_spinner=False)
+def filter_by_departamento(df, departamento):
+    """Obtiene el slice de un departamento vía índice, sin máscara booleana."""
+    # .loc[[dep]] sobre el índice ordenado es una búsqueda binaria, no un escaneo
+    return index_by_departamento(df).loc[[departamento]].reset_index()
+
+@st.cache_data(show_spinner=False)
+def get_departamento_metadata(df):
+    """Listas ordenadas de distritos y años presentes en el slice del departamento."""
+    return sorted(df['DISTRITO'].unique()), sorted(df['AÑO'].unique())
+
+@st.cache_data(show_spinner=False)
+def index_by_distrito_año(df):
+    """Indexa el slice del departamento por (DISTRITO, AÑO) para búsquedas O(1)."""
+    return df.set_index(['DISTRITO', 'AÑO']).sort_index()
+
+@st.cache_data(show_spinner=False)
+def split_by_year(df):
+    """Divide el slice del departamento en un dict {año: DataFrame} con solo
+    las columnas que usa el gráfico de dispersión."""
+    cols = ['DISTRITO', 'GPC_DOM', 'RESIDUOS_MUNICIPALES', 'QRESIDUOS_DOM', 'QRESIDUOS_NO_DOM']
+    cols = [c for c in cols if c in df.columns]
+    return {año: g[cols].reset_index(drop=True) for año, g in df[cols + ['AÑO']].groupby('AÑO')}
+
+@st.cache_data(show_spinner=False)
+def get_line_plot_data(df, distrito):
+    """Serie anual de residuos municipales de un distrito, una fila por año."""
+    sub = df[df['DISTRITO'] == distrito]
+    return sub.groupby('AÑO', as_index=False)['RESIDUOS_MUNICIPALES'].sum()
+
+# --- Funciones de Cálculo ---
+
+@st.cache_data(show_spinner=False)
+def calculate_top_15_gpc_variation(df, start_year, end_year):
+    """Calcula la variación porcentual de GPC_DOM entre dos años y retorna el Top 15."""
+    
+    # Una sola pasada: groupby + unstack lleva el año a columnas sin filtrar
+    # dos veces ni hacer merge, y sin la maquinaria extra de pivot_table
+    sub = df.loc[df['AÑO'].isin([start_year, end_year]), ['DISTRITO', 'AÑO', 'GPC_DOM']]
+    piv = sub.groupby(['AÑO', 'DISTRITO'], observed=True)['GPC_DOM'].first().unstack('AÑO')
+    piv = piv.rename(columns={start_year: 'GPC_Start', end_year: 'GPC_End'})
+
+    # Manejar posibles ceros o NaNs con una sola máscara vectorizada
+    piv = piv.dropna(subset=['GPC_Start', 'GPC_End'])
+    piv = piv[(piv['GPC_Start'] != 0) & (piv['GPC_End'] != 0)]
+
+    piv['Incremento %'] = ((piv['GPC_End'] - piv['GPC_Start']) / piv['GPC_Start']) * 100
+
+    # La selección de columnas ya materializa un frame nuevo: no hace falta .copy()
+    df_plot_top15 = piv.reset_index().nlargest(15, 'Incremento %')[['DISTRITO', 'Incremento %', 'GPC_Start', 'GPC_End']]
+    df_plot_top15.columns = [
+        'Distrito', 
+        'Incremento Porcentual (%)', 
+        f'GPC Domiciliaria {start_year} (kg/hab/día)', 
+        f'GPC Domiciliaria {end_year} (kg/hab/día)'
+    ]
+    return df_plot_top15
+
+# --- Funciones de Gráficos (Vega-Lite) ---
+# Las especificaciones se construyen como dicts y se renderizan con
+# st.vega_lite_chart: se evita la validación de esquema de Altair en cada rerun
+
+# Equivalente a .interactive() de Altair: zoom/pan ligado a las escalas
+_INTERACTIVE_PARAMS = [{"name": "grid", "select": "interval", "bind": "scales"}]
+
+# Títulos de métricas a nivel de módulo: el dict se construye una sola vez y
+# sus claves son la única fuente de verdad para las métricas graficables
+_TITLES = {
+    'GPC_DOM': 'GPC Domiciliaria (kg/hab/día)',
+    'RESIDUOS_MUNICIPALES': 'Residuos Municipales (t)',
+    'QRESIDUOS_DOM': 'Residuos Domiciliarios (t)',
+    'QRESIDUOS_NO_DOM': 'Residuos No Domiciliarios (t)'
+}
+
+METRIC_OPTIONS = list(_TITLES)
+
+def get_eje_title(metric):
+    """Retorna un título legible para la métrica del eje."""
+    return _TITLES.get(metric, metric)
+
+def create_bar_chart(df, start_year, end_year, departamento):
+    """Renderiza el Gráfico de Barras: Top 15 Variación."""
+    spec = {
+        "mark": "bar",
+        "encoding": {
+            "x": {"field": "Distrito", "type": "nominal", "title": "Distrito", "sort": "-y"},
+            "y": {"field": "Incremento Porcentual (%)", "type": "quantitative",
+                  "title": "Incremento GPC Domiciliaria (%)"},
+            "color": {
+                "condition": {"test": "datum['Incremento Porcentual (%)'] > 0", "value": "#2ecc71"},
+                "value": "#e74c3c"
+            },
+            "tooltip": [
+                {"field": "Distrito", "type": "nominal"},
+                {"field": "Incremento Porcentual (%)", "type": "quantitative", "format": ".2f"},
+                {"field": f"GPC Domiciliaria {start_year} (kg/hab/día)", "type": "quantitative", "format": ".3f"},
+                {"field": f"GPC Domiciliaria {end_year} (kg/hab/día)", "type": "quantitative", "format": ".3f"},
+            ]
+        },
+        "title": f"Top 15 de {departamento}: Variación GPC Domiciliaria ({start_year} vs {end_year})",
+        "params": _INTERACTIVE_PARAMS,
+    }
+    st.vega_lite_chart(df, spec, use_container_width=True)
+
+def create_scatter_chart(df_scatter, x_metric, y_metric, scatter_year):
+    """Renderiza el Gráfico de Dispersión: Correlación entre métricas."""
+    # Proyectar solo las columnas usadas: el DataFrame completo viaja al navegador
+    cols = list(dict.fromkeys(['DISTRITO', x_metric, y_metric]))
+    df_scatter = df_scatter[cols]
+    spec = {
+        "mark": {"type": "circle", "size": 60},
+        "encoding": {
+            "x": {"field": x_metric, "type": "quantitative", "title": get_eje_title(x_metric)},
+            "y": {"field": y_metric, "type": "quantitative", "title": get_eje_title(y_metric)},
+            "color": {"field": y_metric, "type": "quantitative",
+                      "scale": {"range": "heatmap"}, "title": get_eje_title(y_metric)},
+            "tooltip": [
+                {"field": "DISTRITO", "type": "nominal"},
+                {"field": x_metric, "type": "quantitative"},
+                {"field": y_metric, "type": "quantitative"},
+            ]
+        },
+        "title": f'Correlación: {get_eje_title(y_metric)} vs {get_eje_title(x_metric)} ({scatter_year})',
+        "params": _INTERACTIVE_PARAMS,
+    }
+    st.vega_lite_chart(df_scatter, spec, use_container_width=True)
+
+def create_line_chart(df_line_plot, distrito_seleccionado, departamento):
+    """Renderiza el Gráfico de Líneas: Tendencia de Residuos por Distrito.
+
+    Espera los datos ya agregados a una fila por año (get_line_plot_data),
+    de modo que Vega no ejecuta ninguna transformación en el navegador.
+    """
+    spec = {
+        "mark": {"type": "line", "point": True},
+        "encoding": {
+            "x": {"field": "AÑO", "type": "nominal", "title": "Año", "axis": {"format": "d"}},
+            "y": {"field": "RESIDUOS_MUNICIPALES", "type": "quantitative",
+                  "title": "Cantidad de residuos (t)"},
+            "tooltip": [
+                {"field": "AÑO", "type": "nominal"},
+                {"field": "RESIDUOS_MUNICIPALES", "type": "quantitative",
+                 "title": "Cantidad de residuos (t)", "format": ",.0f"},
+            ]
+        },
+        # Sin zoom/pan: para una serie anual corta los signals de selección
+        # solo añaden trabajo al renderizador
+        "title": f"Evolución de Residuos en {distrito_seleccionado} ({departamento})",
+    }
+    st.vega_lite_chart(df_line_plot, spec, use_container_width=True)
+
+# --- Función de Gráfico de Pastel y Métricas ---
+
+def create_pie_chart_and_metrics(df_indexado, departamento_sel, distrito_sel, año_sel):
+    """Crea el gráfico de pastel y las métricas de resumen para un distrito/año."""
+
+    st.subheader(f"Análisis Detallado de Residuos: {distrito_sel}, {departamento_sel} - {año_sel}")
+
+    # Búsqueda directa sobre el índice (DISTRITO, AÑO): sin máscaras booleanas
+    try:
+        fila = df_indexado.loc[(distrito_sel, año_sel)]
+    except KeyError:
+        st.warning(f"No se encontraron datos para los filtros: Distrito: {distrito_sel}, Año: {año_sel}.")
+        return
+
+    if isinstance(fila, pd.DataFrame):
+        fila = fila.iloc[0]
+    residuos_dom = float(fila['QRESIDUOS_DOM'])
+    residuos_no_dom = float(fila['QRESIDUOS_NO_DOM'])
+    
+    labels = ['Residuos Domésticos', 'Residuos No Domésticos']
+    values = [residuos_dom, residuos_no_dom]
+
+    # Gráfico de pastel como arco Vega-Lite: mismo pipeline de renderizado
+    # que el resto de los gráficos, sin re-inicializar Plotly en cada rerun
+    pie_df = pd.DataFrame({'Tipo': labels, 'Cantidad (t)': values})
+    spec = {
+        "mark": {"type": "arc"},
+        "encoding": {
+            "theta": {"field": "Cantidad (t)", "type": "quantitative"},
+            "color": {"field": "Tipo", "type": "nominal", "title": None,
+                      "scale": {"domain": labels, "range": ["#FF6B6B", "#4ECDC4"]},
+                      "legend": {"orient": "bottom"}},
+            "tooltip": [
+                {"field": "Tipo", "type": "nominal"},
+                {"field": "Cantidad (t)", "type": "quantitative", "format": ",.2f"},
+            ]
+        },
+        "title": "Distribución de Residuos Municipales",
+        "view": {"stroke": None},
+    }
+    st.vega_lite_chart(pie_df, spec, use_container_width=True)
+
+    # Mostrar métricas
+    col1, col2, col3 = st.columns(3)
+    total = residuos_dom + residuos_no_dom
+    
+    with col1:
+        st.metric("Residuos Domésticos", f"{residuos_dom:,.2f} ton")
+    with col2:
+        st.metric("Residuos No Domésticos", f"{residuos_no_dom:,.2f} ton")
+    with col3:
+        st.metric("Total Residuos", f"{total:,.2f} ton")
+